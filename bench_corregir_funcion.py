@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del coste por llamada al corregir ejercicios de funciones.
+
+Compara tres formas de ejecutar los tests puros de un ejercicio:
+  - original: el camino por test anterior a la ejecución en lote
+    (TemporaryDirectory + patch de input + redirect_stdout + os.listdir),
+  - aislado: el camino por test actual (_ejecutar_test_funcion, sandbox
+    reutilizado y salida comparada al vuelo),
+  - en lote: _ejecutar_lote_puro.
+Se ejecuta con el mismo Python que Thonny:
+
+    python bench_corregir_funcion.py [n_tests]
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+import configuracion as conf
+
+
+def suma(a, b):
+    return a + b
+
+
+def _ejecutar_original(func_alumno, test):
+    """Réplica del cuerpo por test de corregir_ejercicio_funcion original."""
+    with tempfile.TemporaryDirectory() as work:
+        cwd_old = os.getcwd()
+        os.chdir(work)
+        try:
+            for nom, contenido in test["filesIni"].items():
+                with open(nom, "w", encoding="utf-8") as f:
+                    f.write(contenido)
+
+            stdin_io = io.StringIO(test["stdin"])
+            stdout_io = io.StringIO()
+
+            def fake_input(prompt=""):
+                return stdin_io.readline().rstrip("\n")
+
+            with redirect_stdout(stdout_io), patch("builtins.input", fake_input):
+                ret_obt = func_alumno(*test["args"])
+
+            stdout_obt = stdout_io.getvalue()
+
+            files_end = {}
+            for nom in os.listdir(work):
+                if os.path.isfile(nom):
+                    with open(nom, "r", encoding="utf-8", errors="replace") as f:
+                        files_end[nom] = f.read()
+        finally:
+            os.chdir(cwd_old)
+    return ret_obt, stdout_obt, files_end
+
+
+def _tests(n):
+    return [
+        {"funcName": "suma", "args": [i, i], "stdin": "", "filesIni": {},
+         "return": 2 * i, "stdout": "", "filesEnd": {}}
+        for i in range(n)
+    ]
+
+
+def _medir(fn, repeticiones=5):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    tests = _tests(n)
+    lote = [(idx, suma, t) for idx, t in enumerate(tests, 1)]
+
+    original = _medir(lambda: [_ejecutar_original(suma, t) for t in tests])
+    aislado = _medir(lambda: [conf._ejecutar_test_funcion(suma, t) for t in tests])
+    en_lote = _medir(lambda: conf._ejecutar_lote_puro(lote))
+
+    print(f"tests: {n}")
+    print(f"original : {original / n * 1e6:9.1f} µs/llamada")
+    print(f"aislado  : {aislado / n * 1e6:9.1f} µs/llamada")
+    print(f"en lote  : {en_lote / n * 1e6:9.1f} µs/llamada")
+    print(f"mejora   : {original / en_lote:9.1f}x frente al original")
+
+
+if __name__ == "__main__":
+    main()
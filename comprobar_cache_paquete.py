@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Comprobación de la caché del paquete de ejercicios contra un servidor
+HTTP local (http.server) que hace de sustituto del repositorio remoto.
+
+Cubre: descarga inicial, actualización delta, borrado de entradas,
+reparación de ficheros que faltan, hash incorrecto, rutas no válidas y
+un manifiesto generado con generar_manifiesto.py.
+
+    python comprobar_cache_paquete.py
+"""
+
+import functools
+import hashlib
+import http.server
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import configuracion as conf
+import generar_manifiesto
+
+
+class _Servidor:
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+        self.pedidos = []
+        servidor = self
+
+        class Manejador(http.server.SimpleHTTPRequestHandler):
+            def do_GET(self):
+                servidor.pedidos.append(self.path.lstrip("/"))
+                super().do_GET()
+
+            def log_message(self, *args):
+                pass
+
+        manejador = functools.partial(Manejador, directory=carpeta)
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), manejador)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def publicar(self, version, ficheros, hashes=None):
+        """Escribe los ficheros y el manifiesto (hashes opcionales forzados)."""
+        for ruta, datos in ficheros.items():
+            p = os.path.join(self.carpeta, *ruta.split("/"))
+            os.makedirs(os.path.dirname(p), exist_ok=True)
+            with open(p, "wb") as f:
+                f.write(datos)
+        manifiesto = {
+            "version": version,
+            "ficheros": {r: hashlib.sha256(d).hexdigest() for r, d in ficheros.items()},
+        }
+        manifiesto["ficheros"].update(hashes or {})
+        with open(os.path.join(self.carpeta, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f)
+        self.pedidos.clear()
+
+    def descargas(self):
+        return sorted(p for p in self.pedidos if p != "manifest.json")
+
+
+def main():
+    raiz = tempfile.mkdtemp(prefix="paquete_")
+    try:
+        srv = _Servidor(os.path.join(raiz, "srv"))
+        cache = conf._CachePaquete(os.path.join(raiz, "cache"), srv.url)
+
+        # 1) Descarga inicial
+        srv.publicar("1", {"p001/ej.py": b"print(1)\n", "tests.json": b'{"p001": []}'})
+        assert cache.sincronizar() == (2, 0)
+        assert cache.tests() == {"p001": []}
+
+        # 2) Misma versión: solo se pide el manifiesto
+        srv.pedidos.clear()
+        assert cache.sincronizar() == (0, 0)
+        assert srv.descargas() == []
+
+        # 3) Delta: una entrada nueva, una borrada, el resto intacto
+        srv.publicar("2", {"p002/ej.py": b"print(2)\n", "tests.json": b'{"p001": []}'})
+        assert cache.sincronizar() == (1, 1)
+        assert srv.descargas() == ["p002/ej.py"]
+        assert not os.path.exists(cache._ruta_local("p001/ej.py"))
+
+        # 4) Un fichero borrado de la caché se repara sin cambiar la versión
+        os.remove(cache._ruta_local("p002/ej.py"))
+        srv.pedidos.clear()
+        assert cache.sincronizar() == (1, 0)
+        assert srv.descargas() == ["p002/ej.py"]
+
+        destino = os.path.join(raiz, "destino")
+        assert cache.copiar_a(destino) == 1
+        assert os.path.isfile(os.path.join(destino, "p002", "ej.py"))
+
+        # 5) Hash incorrecto: error y el manifiesto local no avanza
+        srv.publicar("3", {"p002/ej.py": b"print(3)\n", "tests.json": b'{"p001": []}'},
+                     hashes={"p002/ej.py": "0" * 64})
+        try:
+            cache.sincronizar()
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("se esperaba error de hash")
+        assert cache.manifiesto_local()["version"] == "2"
+
+        # 6) Rutas fuera de la caché
+        for ruta in ("../x", "/etc/x", "C:/x", "C:x", "\\\\srv\\x"):
+            try:
+                cache._ruta_local(ruta)
+            except ValueError:
+                continue
+            raise AssertionError(f"ruta aceptada: {ruta}")
+
+        # 7) Manifiesto generado con generar_manifiesto.py sobre el árbol servido
+        manifiesto = generar_manifiesto.generar(srv.carpeta)
+        with open(os.path.join(srv.carpeta, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f)
+        assert "manifest.json" not in manifiesto["ficheros"]
+        srv.pedidos.clear()
+        cache.sincronizar()
+        assert cache.manifiesto_local()["version"] == manifiesto["version"]
+        assert generar_manifiesto.generar(srv.carpeta) == manifiesto
+
+        srv.httpd.shutdown()
+        print("OK: caché del paquete")
+    finally:
+        shutil.rmtree(raiz, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
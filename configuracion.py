@@ -12,11 +12,24 @@ import traceback
 import io
 import zipfile
 import urllib.request
+import urllib.parse
+import ntpath
 import socket
 import uuid
-from collections import Counter
-
-from thonny import get_workbench
+import sqlite3
+import threading
+import queue
+import hashlib
+import json
+import time
+import csv
+import shutil
+import atexit
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from thonny import get_workbench, get_runner
 from tkinter import (
     messagebox,
     filedialog,
@@ -32,7 +45,13 @@ import requests
 # ======================================================================
 
 ALUMNO_DNI = ""
+# Subir cada corrección (fuente, DNI, equipo y resultados) a los servidores
+# de la asignatura. Desactivado por defecto: solo se guarda el historial local.
+SUBIR_RESULTADOS = False
 ZIP_URL = "https://github.com/FI-UMH/Thonny-Ficheros/archive/refs/heads/main.zip"
+RESULTADOS_DB = os.path.join(os.path.expanduser("~"), ".thonny_modulos", "resultados.sqlite3")
+PAQUETE_URL = "https://raw.githubusercontent.com/FI-UMH/Thonny-Ficheros/main/"
+PAQUETE_DIR = os.path.join(os.path.expanduser("~"), ".thonny_modulos", "paquete")
 
 _PAREN_RE = re.compile(r"\([^()]*\)")
 _HDR_DNI_RE = re.compile(r"^\s*#\s*DNI\s*=\s*(.+)", re.MULTILINE | re.IGNORECASE)
@@ -40,6 +59,10 @@ _HDR_EJER_RE = re.compile(r"^\s*#\s*EJERCICIO\s*=\s*(.+)", re.MULTILINE | re.IGN
 
 EXCLUDE = {"alumno.py", "stdin.txt", "stdout.txt"}
 
+# Últimas latencias (ms) de "Ejecutar y corregir": desde la orden hasta la
+# primera respuesta del programa (salida, petición de teclado o fin)
+LATENCIAS_EJECUCION = deque(maxlen=100)
+
 
 # ======================================================================
 #                          UTILIDADES COMUNES
@@ -58,38 +81,246 @@ def _get_editor_text():
     except Exception:
         return None
 
+
+def _en_segundo_plano(funcion, al_terminar, *args):
+    """
+    Ejecuta funcion(*args) en un hilo y, desde el bucle de Tk, llama a
+    al_terminar(resultado, error) cuando acaba (error es None si fue bien).
+    """
+    wb = get_workbench()
+    salida = {}
+
+    def trabajo():
+        try:
+            salida["resultado"] = funcion(*args)
+        except Exception as e:
+            salida["error"] = e
+
+    hilo = threading.Thread(target=trabajo, daemon=True)
+    hilo.start()
+
+    # Tk no es seguro entre hilos: se consulta el resultado desde el bucle
+    def comprobar():
+        if hilo.is_alive():
+            wb.after(20, comprobar)
+            return
+        al_terminar(salida.get("resultado"), salida.get("error"))
+
+    comprobar()
+
+
 # ======================================================================
 #                BLOQUE 1 — DESCARGAR FICHEROS
 # ======================================================================
 
-def descargar_ficheros():
-    carpeta = filedialog.askdirectory(title="Selecciona carpeta destino")
-    if not carpeta:
-        return
+class _CachePaquete:
+    """
+    Copia local y versionada del paquete de ejercicios (ficheros de
+    partida + tests.json). El servidor publica 'manifest.json':
 
-    try:
+        {"version": "...", "ficheros": {"ruta/relativa": "<sha256>", ...}}
+
+    El manifiesto se genera con generar_manifiesto.py en la raíz de
+    Thonny-Ficheros y se sube junto con los ficheros en cada publicación.
+    Al sincronizar solo se descargan las entradas cuyo hash ha cambiado;
+    una vez sincronizado el plugin funciona sin conexión.
+    """
+
+    MANIFIESTO = "manifest.json"
+    TESTS = "tests.json"
+
+    def __init__(self, carpeta, url_base):
+        self.carpeta = carpeta
+        self.url_base = url_base.rstrip("/") + "/"
+        self._lock = threading.Lock()
+
+    def _ruta_local(self, ruta):
+        partes = ruta.replace("\\", "/").split("/")
+        # También con ntpath: 'C:/x' o rutas UNC no son relativas en Windows
+        if (os.path.isabs(ruta) or ntpath.isabs(ruta)
+                or ntpath.splitdrive(ruta)[0] or ".." in partes):
+            raise ValueError(f"Ruta no válida en el manifiesto: {ruta}")
+        return os.path.join(self.carpeta, "ficheros", *partes)
+
+    def _descargar(self, ruta):
         req = urllib.request.Request(
-            ZIP_URL,
+            self.url_base + urllib.parse.quote(ruta),
             headers={"User-Agent": "ThonnyFileLoader"},
         )
-        data = urllib.request.urlopen(req, timeout=20).read()
+        with urllib.request.urlopen(req, timeout=20) as r:
+            return r.read()
+
+    @staticmethod
+    def _escribir_atomico(ruta, datos):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        tmp = ruta + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(datos)
+        os.replace(tmp, ruta)
+
+    def manifiesto_local(self):
+        try:
+            with open(os.path.join(self.carpeta, self.MANIFIESTO), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def disponible(self):
+        return bool(self.manifiesto_local().get("ficheros"))
+
+    def sincronizar(self):
+        """
+        Actualiza la caché con el manifiesto remoto.
+        Devuelve (descargados, borrados). Lanza excepción si no hay red.
+        """
+        with self._lock:
+            remoto = json.loads(self._descargar(self.MANIFIESTO).decode("utf-8"))
+            local = self.manifiesto_local()
+
+            fich_remotos = remoto.get("ficheros") or {}
+            fich_locales = local.get("ficheros") or {}
+
+            # También se vuelven a descargar los ficheros que falten en la
+            # caché aunque la versión no haya cambiado
+            cambiados = sorted(
+                ruta for ruta, h in fich_remotos.items()
+                if fich_locales.get(ruta) != h
+                or not os.path.isfile(self._ruta_local(ruta))
+            )
+            misma_version = (local.get("version") is not None
+                             and local.get("version") == remoto.get("version"))
+            if misma_version and not cambiados:
+                return 0, 0
+
+            def actualizar(ruta):
+                datos = self._descargar(ruta)
+                if hashlib.sha256(datos).hexdigest() != fich_remotos[ruta]:
+                    raise ValueError(f"Hash incorrecto al descargar {ruta}")
+                self._escribir_atomico(self._ruta_local(ruta), datos)
+
+            # Pool propio: las descargas lentas no deben retrasar el
+            # autoguardado (_AUTOGUARDADO)
+            with ThreadPoolExecutor(max_workers=4, thread_name_prefix="paquete") as ex:
+                futuros = [ex.submit(actualizar, ruta) for ruta in cambiados]
+                try:
+                    for futuro in futuros:
+                        futuro.result()
+                except BaseException:
+                    ex.shutdown(wait=True, cancel_futures=True)
+                    raise
+
+            borrados = 0
+            for ruta in fich_locales.keys() - fich_remotos.keys():
+                try:
+                    os.remove(self._ruta_local(ruta))
+                    borrados += 1
+                except (OSError, ValueError):
+                    pass
+
+            # El manifiesto se escribe al final: si algo falla antes, la
+            # próxima sincronización vuelve a comparar contra el anterior.
+            self._escribir_atomico(
+                os.path.join(self.carpeta, self.MANIFIESTO),
+                json.dumps(remoto, ensure_ascii=False, indent=1).encode("utf-8"),
+            )
+            return len(cambiados), borrados
+
+    def tests(self):
+        """Tests del paquete en caché (dict), o None si no hay."""
+        if self.TESTS not in (self.manifiesto_local().get("ficheros") or {}):
+            return None
+        try:
+            with open(self._ruta_local(self.TESTS), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def copiar_a(self, destino):
+        """Copia los ficheros de partida (sin tests.json) a 'destino'."""
+        n = 0
+        for ruta in sorted(self.manifiesto_local().get("ficheros") or {}):
+            if ruta == self.TESTS:
+                continue
+            dest_path = os.path.join(destino, *ruta.split("/"))
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            shutil.copyfile(self._ruta_local(ruta), dest_path)
+            n += 1
+        return n
 
-        with zipfile.ZipFile(io.BytesIO(data)) as z:
-            for name in z.namelist():
-                if name.endswith("/"):
-                    continue
 
-                out = name.split("/", 1)[1]
-                dest_path = os.path.join(carpeta, out)
+PAQUETE = _CachePaquete(PAQUETE_DIR, PAQUETE_URL)
 
-                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-                with open(dest_path, "wb") as f:
-                    f.write(z.read(name))
 
-        messagebox.showinfo("Descargar ficheros",
-                            "Ficheros descargados correctamente.")
+def _sincronizar_paquete_silencioso():
+    try:
+        PAQUETE.sincronizar()
+    except Exception:
+        pass
+
+
+def _descargar_zip(carpeta):
+    """Descarga completa del repositorio (si no hay manifiesto ni caché)."""
+    req = urllib.request.Request(
+        ZIP_URL,
+        headers={"User-Agent": "ThonnyFileLoader"},
+    )
+    data = urllib.request.urlopen(req, timeout=20).read()
+
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        for name in z.namelist():
+            if name.endswith("/"):
+                continue
+
+            out = name.split("/", 1)[1]
+            dest_path = os.path.join(carpeta, out)
+
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            with open(dest_path, "wb") as f:
+                f.write(z.read(name))
+
+
+def _descargar_en(carpeta):
+    """
+    Sincroniza la caché y copia los ficheros a 'carpeta' (fuera del hilo
+    de Tk). Devuelve None si se usó el paquete actualizado o el ZIP, o la
+    excepción de red si se copió la caché local sin poder actualizarla.
+    """
+    try:
+        PAQUETE.sincronizar()
     except Exception as e:
-        messagebox.showerror("Error","Error al descargar ficheros", str(e))
+        # Sin conexión o sin manifiesto: se usa la caché si existe
+        if not PAQUETE.disponible():
+            _descargar_zip(carpeta)
+            return None
+        PAQUETE.copiar_a(carpeta)
+        return e
+
+    PAQUETE.copiar_a(carpeta)
+    return None
+
+
+def descargar_ficheros():
+    carpeta = filedialog.askdirectory(title="Selecciona carpeta destino")
+    if not carpeta:
+        return
+
+    def al_terminar(error_red, error):
+        if error is not None:
+            messagebox.showerror("Error", f"Error al descargar ficheros:\n{error}")
+        elif error_red is not None:
+            version = PAQUETE.manifiesto_local().get("version", "?")
+            messagebox.showwarning(
+                "Descargar ficheros",
+                "No se ha podido contactar con el servidor.\n"
+                f"Se han copiado los ficheros de la copia local (versión {version}), "
+                "que puede no estar actualizada.",
+            )
+        else:
+            messagebox.showinfo("Descargar ficheros",
+                                "Ficheros descargados correctamente.")
+
+    # La sincronización puede esperar a la de arranque: no bloquear la interfaz
+    _en_segundo_plano(_descargar_en, al_terminar, carpeta)
 
 
 # ======================================================================
@@ -192,6 +423,217 @@ def _preprocesar_codigo(src: str) -> str:
     return cabecera + src_mod
 
 
+class _PoolSandbox:
+    """
+    Conjunto de directorios de trabajo reutilizables para los tests.
+    Al reutilizar un directorio solo se borra lo que sobra respecto a los
+    ficheros iniciales del nuevo test, y solo se reescriben los que han
+    cambiado (se recuerda su contenido y su tamaño/mtime tras escribirlos).
+    """
+
+    def __init__(self, prefijo="corr_", maximo=4):
+        self.prefijo = prefijo
+        self.maximo = maximo
+        self._libres = []
+        self._firmas = {}
+        self._lock = threading.Lock()
+        atexit.register(self.cerrar)
+
+    def obtener(self):
+        with self._lock:
+            if self._libres:
+                return self._libres.pop()
+        return tempfile.mkdtemp(prefix=self.prefijo)
+
+    def devolver(self, ruta):
+        with self._lock:
+            if len(self._libres) < self.maximo:
+                self._libres.append(ruta)
+                return
+            self._firmas.pop(ruta, None)
+        shutil.rmtree(ruta, ignore_errors=True)
+
+    def _preparar(self, ruta, ficheros):
+        previas = self._firmas.pop(ruta, {})
+        conservar = {}
+
+        with os.scandir(ruta) as it:
+            for entry in it:
+                firma = previas.get(entry.name)
+                if (firma is not None
+                        and firma[0] == ficheros.get(entry.name)
+                        and entry.is_file(follow_symlinks=False)
+                        and _firma_stat(entry.stat(follow_symlinks=False)) == firma[1]):
+                    conservar[entry.name] = firma
+                elif entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+
+        for nombre in sorted(ficheros):
+            if nombre in conservar:
+                continue
+            destino = os.path.join(ruta, nombre)
+            os.makedirs(os.path.dirname(destino) or ruta, exist_ok=True)
+            _escribir_fichero(destino, ficheros[nombre])
+            # Solo se recuerdan los ficheros de primer nivel
+            if os.path.dirname(destino) == ruta:
+                conservar[nombre] = (ficheros[nombre], _firma_stat(os.stat(destino)))
+
+        self._firmas[ruta] = conservar
+
+    @contextmanager
+    def sandbox(self, ficheros=None):
+        """Directorio de trabajo que contiene exactamente 'ficheros'."""
+        ruta = self.obtener()
+        try:
+            try:
+                self._preparar(ruta, ficheros or {})
+            except OSError:
+                self._firmas.pop(ruta, None)
+                shutil.rmtree(ruta, ignore_errors=True)
+                ruta = tempfile.mkdtemp(prefix=self.prefijo)
+                self._preparar(ruta, ficheros or {})
+            yield ruta
+        finally:
+            self.devolver(ruta)
+
+    def cerrar(self):
+        with self._lock:
+            libres, self._libres = self._libres, []
+            self._firmas.clear()
+        for ruta in libres:
+            shutil.rmtree(ruta, ignore_errors=True)
+
+
+_SANDBOXES = _PoolSandbox()
+
+
+def _firma_stat(st):
+    return st.st_size, st.st_mtime_ns
+
+
+def _vaciar_directorio(ruta):
+    with os.scandir(ruta) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.unlink(entry.path)
+
+
+def _escribir_fichero(ruta, contenido):
+    if isinstance(contenido, bytes):
+        with open(ruta, "wb") as f:
+            f.write(contenido)
+    else:
+        with open(ruta, "w", encoding="utf-8") as f:
+            f.write(contenido)
+
+
+def _leer_ficheros(carpeta, excluir=()):
+    """
+    Lee los ficheros finales de la carpeta (sin subdirectorios).
+    Los ficheros de texto UTF-8 se devuelven como str con saltos de
+    línea normalizados; el resto se devuelve como bytes.
+    """
+    ficheros = {}
+    with os.scandir(carpeta) as it:
+        entradas = sorted(
+            (e for e in it if e.name not in excluir and e.is_file()),
+            key=lambda e: e.name,
+        )
+    for entry in entradas:
+        with open(entry.path, "rb") as f:
+            datos = f.read()
+        try:
+            texto = datos.decode("utf-8")
+        except UnicodeDecodeError:
+            ficheros[entry.name] = datos
+        else:
+            ficheros[entry.name] = texto.replace("\r\n", "\n").replace("\r", "\n")
+    return ficheros
+
+
+def _ficheros_iguales(obtenidos, esperados):
+    """Compara ficheros; si alguno es binario, la comparación es por bytes."""
+    if obtenidos.keys() != esperados.keys():
+        return False
+    for nombre, obt in obtenidos.items():
+        exp = esperados[nombre]
+        if isinstance(obt, bytes) or isinstance(exp, bytes):
+            if isinstance(obt, str):
+                obt = obt.encode("utf-8")
+            if isinstance(exp, str):
+                exp = exp.encode("utf-8")
+        if obt != exp:
+            return False
+    return True
+
+
+class _SalidaDetenida(BaseException):
+    """
+    Se lanza desde la salida capturada para detener el código del alumno.
+    Hereda de BaseException para que un 'except Exception' del alumno
+    no la oculte.
+    """
+
+
+class _SalidaComparada(io.TextIOBase):
+    """
+    Sustituto de io.StringIO para redirect_stdout que compara la salida
+    con la esperada a medida que se escribe. En cuanto difiere (o supera
+    la longitud esperada) detiene el test; solo se guarda una ventana de
+    texto alrededor de la primera diferencia para el informe.
+    """
+
+    def __init__(self, esperado, contexto=300):
+        self.esperado = esperado or ""
+        self.contexto = contexto
+        self.reiniciar(self.esperado)
+
+    def reiniciar(self, esperado):
+        self.esperado = esperado or ""
+        self.pos = 0
+        self.divergencia = None
+        self._sobrante = ""
+
+    def writable(self):
+        return True
+
+    def write(self, s):
+        if self.divergencia is not None:
+            raise _SalidaDetenida()
+
+        fin = self.pos + len(s)
+        if self.esperado[self.pos:fin] == s:
+            self.pos = fin
+            return len(s)
+
+        # Primera posición distinta dentro del fragmento
+        k = 0
+        tramo = self.esperado[self.pos:fin]
+        while k < len(tramo) and tramo[k] == s[k]:
+            k += 1
+        self.divergencia = self.pos + k
+        self._sobrante = s[k:k + self.contexto]
+        raise _SalidaDetenida()
+
+    def coincide(self):
+        return self.divergencia is None and self.pos == len(self.esperado)
+
+    def getvalue(self):
+        """Salida obtenida (recortada si se detuvo por una diferencia)."""
+        if self.divergencia is None:
+            return self.esperado[:self.pos]
+
+        inicio = max(0, self.divergencia - self.contexto)
+        previo = self.esperado[inicio:self.divergencia]
+        if inicio > 0:
+            previo = "…" + previo
+        return f"{previo}{self._sobrante}…\n[salida detenida: no coincide con la esperada]\n"
+
+
 def _run_single_test(src_code: str, test: dict) -> dict:
     res = {
         "ok_stdout": False,
@@ -202,7 +644,7 @@ def _run_single_test(src_code: str, test: dict) -> dict:
     }
 
     try:
-        with tempfile.TemporaryDirectory(prefix="corr_") as td:
+        with _SANDBOXES.sandbox(test.get("filesIni") or {}) as td:
             alumno_py = os.path.join(td, "alumno.py")
 
             src_mod = _preprocesar_codigo(src_code)
@@ -211,13 +653,6 @@ def _run_single_test(src_code: str, test: dict) -> dict:
 
             stdin_content = test.get("stdin", "")
 
-            # Ficheros iniciales
-            for fn, content in (test.get("filesIni") or {}).items():
-                fn_path = os.path.join(td, fn)
-                os.makedirs(os.path.dirname(fn_path) or td, exist_ok=True)
-                with open(fn_path, "w", encoding="utf-8") as f:
-                    f.write(content)
-
             # Ejecutar programa del alumno
             completed = subprocess.run(
                 [sys.executable, alumno_py],
@@ -232,20 +667,14 @@ def _run_single_test(src_code: str, test: dict) -> dict:
             res["stdout_alumno"] = stdout
 
             # Ficheros finales
-            files_now = {}
-            for name in os.listdir(td):
-                p = os.path.join(td, name)
-                if os.path.isdir(p) or name in EXCLUDE:
-                    continue
-                with open(p, "r", encoding="utf-8", errors="replace") as f:
-                    files_now[name] = f.read()
+            files_now = _leer_ficheros(td, excluir=EXCLUDE)
             res["files_end"] = files_now
 
             exp_stdout = test.get("stdout", "")
             exp_files = test.get("filesEnd") or {}
 
             res["ok_stdout"] = (_paren_counter(stdout) == _paren_counter(exp_stdout))
-            res["ok_files"] = (files_now == exp_files)
+            res["ok_files"] = _ficheros_iguales(files_now, exp_files)
 
     except subprocess.TimeoutExpired:
         res["error"] = "Tiempo excedido."
@@ -255,11 +684,243 @@ def _run_single_test(src_code: str, test: dict) -> dict:
     return res
 
 
+# ======================================================================
+#          HISTORIAL DE RESULTADOS (SQLITE, SOLO AÑADIR)
+# ======================================================================
+
+_ESQUEMA_HISTORIAL = """
+CREATE TABLE IF NOT EXISTS intentos (
+    id        INTEGER PRIMARY KEY,
+    dni       TEXT NOT NULL,
+    ejercicio TEXT NOT NULL,
+    hash      TEXT NOT NULL,
+    fecha     REAL NOT NULL,
+    aprobados INTEGER NOT NULL,
+    total     INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tests (
+    intento INTEGER NOT NULL REFERENCES intentos(id),
+    idx     INTEGER NOT NULL,
+    ok      INTEGER NOT NULL,
+    tiempo  REAL NOT NULL,
+    PRIMARY KEY (intento, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS intentos_dni_ejer
+    ON intentos (dni, ejercicio, fecha);
+"""
+
+
+class _HistorialResultados:
+    """
+    Almacén local de resultados de corrección (solo se añaden filas).
+    Las escrituras se encolan y un hilo en segundo plano las agrupa
+    en una única transacción; la base de datos usa modo WAL para que
+    las consultas no bloqueen al hilo escritor.
+    """
+
+    LOTE_MAX = 200
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._lock = threading.Lock()
+        # Intentos encolados y aún no escritos (o descartados)
+        self._pendientes = 0
+        self._cond = threading.Condition()
+
+    def _conectar(self):
+        os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        con = sqlite3.connect(self.ruta, timeout=10)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.executescript(_ESQUEMA_HISTORIAL)
+        return con
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(
+                    target=self._bucle, name="historial-resultados", daemon=True
+                )
+                self._hilo.start()
+
+    def registrar(self, dni, ejercicio, src_code, resultados):
+        """
+        Encola un intento. 'resultados' es una lista de tuplas
+        (idx, ok, tiempo) con un elemento por test.
+        """
+        fuente = (src_code or "").encode("utf-8")
+        intento = (
+            (dni or "").upper(),
+            ejercicio,
+            hashlib.sha256(fuente).hexdigest(),
+            time.time(),
+            sum(1 for _, ok, _ in resultados if ok),
+            len(resultados),
+            [(idx, int(bool(ok)), tiempo) for idx, ok, tiempo in resultados],
+        )
+        with self._cond:
+            self._pendientes += 1
+        self._cola.put(intento)
+        self._arrancar()
+
+    def _terminados(self, n):
+        with self._cond:
+            self._pendientes -= n
+            self._cond.notify_all()
+
+    def _bucle(self):
+        try:
+            con = self._conectar()
+        except Exception:
+            # Sin base de datos (carpeta no escribible, fichero bloqueado...):
+            # se descartan los intentos encolados para no bloquear vaciar().
+            # El siguiente registrar() vuelve a arrancar el hilo y reintenta.
+            traceback.print_exc()
+            descartados = 0
+            while True:
+                try:
+                    self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                self._cola.task_done()
+                descartados += 1
+            self._terminados(descartados)
+            return
+
+        try:
+            while True:
+                lote = [self._cola.get()]
+                while len(lote) < self.LOTE_MAX:
+                    try:
+                        lote.append(self._cola.get_nowait())
+                    except queue.Empty:
+                        break
+                try:
+                    with con:
+                        for *cab, detalle in lote:
+                            cur = con.execute(
+                                "INSERT INTO intentos "
+                                "(dni, ejercicio, hash, fecha, aprobados, total) "
+                                "VALUES (?, ?, ?, ?, ?, ?)",
+                                cab,
+                            )
+                            con.executemany(
+                                "INSERT INTO tests (intento, idx, ok, tiempo) "
+                                "VALUES (?, ?, ?, ?)",
+                                [(cur.lastrowid, *t) for t in detalle],
+                            )
+                except Exception:
+                    traceback.print_exc()
+                finally:
+                    for _ in lote:
+                        self._cola.task_done()
+                    self._terminados(len(lote))
+        finally:
+            con.close()
+
+    def vaciar(self, timeout=5.0):
+        """
+        Espera a que todos los intentos encolados estén escritos.
+        Devuelve False si se agota el tiempo o el hilo escritor ha terminado.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._pendientes == 0
+                or self._hilo is None or not self._hilo.is_alive(),
+                timeout,
+            ) and self._pendientes == 0
+
+    def ultimos_aprobados(self, dni=None):
+        """
+        Último intento con todos los tests superados por alumno y ejercicio.
+        Devuelve filas (dni, ejercicio, fecha, hash).
+        """
+        self.vaciar()
+        sql = (
+            "SELECT dni, ejercicio, MAX(fecha), hash FROM intentos "
+            "WHERE aprobados = total"
+        )
+        params = ()
+        if dni:
+            sql += " AND dni = ?"
+            params = (dni.upper(),)
+        sql += " GROUP BY dni, ejercicio ORDER BY dni, ejercicio"
+
+        con = self._conectar()
+        try:
+            return con.execute(sql, params).fetchall()
+        finally:
+            con.close()
+
+    def exportar(self, ruta_csv):
+        """
+        Exporta todos los intentos a CSV. Los tests de cada intento se
+        codifican en una sola columna: 'P' superado, 'F' fallido (letras,
+        para que las hojas de cálculo no lo lean como número).
+        Devuelve (intentos exportados, False si quedaron intentos sin escribir).
+        """
+        completo = self.vaciar()
+        con = self._conectar()
+        try:
+            filas = con.execute(
+                "SELECT i.dni, i.ejercicio, i.hash, i.fecha, i.aprobados, i.total, "
+                "       (SELECT group_concat(CASE ok WHEN 1 THEN 'P' ELSE 'F' END, '') FROM "
+                "            (SELECT ok FROM tests WHERE intento = i.id ORDER BY idx)) "
+                "FROM intentos i ORDER BY i.dni, i.ejercicio, i.fecha"
+            )
+            with open(ruta_csv, "w", encoding="utf-8", newline="") as f:
+                w = csv.writer(f)
+                w.writerow(["dni", "ejercicio", "hash", "fecha",
+                            "aprobados", "total", "tests"])
+                n = 0
+                for dni, ejer, h, fecha, apr, total, tests in filas:
+                    fecha_txt = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(fecha))
+                    w.writerow([dni, ejer, h[:12], fecha_txt, apr, total, tests or ""])
+                    n += 1
+            return n, completo
+        finally:
+            con.close()
+
+
+HISTORIAL = _HistorialResultados(RESULTADOS_DB)
+
+
+def exportar_resultados():
+    ruta = filedialog.asksaveasfilename(
+        title="Exportar resultados",
+        defaultextension=".csv",
+        filetypes=[("CSV", "*.csv")],
+    )
+    if not ruta:
+        return
+
+    # Se exporta fuera del hilo de Tk: vaciar() puede esperar al escritor
+    def al_terminar(resultado, error):
+        if error is not None:
+            messagebox.showerror("Error", f"Error al exportar resultados:\n{error}")
+            return
+        n, completo = resultado
+        if completo:
+            messagebox.showinfo("Exportar resultados",
+                                f"Exportados {n} intentos correctamente.")
+        else:
+            messagebox.showwarning(
+                "Exportar resultados",
+                f"Exportados {n} intentos.\n"
+                "Algunas correcciones recientes aún no se habían guardado "
+                "y no aparecen en el fichero.",
+            )
+
+    _en_segundo_plano(HISTORIAL.exportar, al_terminar, ruta)
+
+
 # ======================================================================
 #                SUBIR EJERCICIO (EN SEGUNDO PLANO)
 # ======================================================================
 
-def _subir_ejercicios(ejercicio, dni, src_code):
+def _subir_ejercicios(ejercicio, dni, src_code, resultados=None):
     """Sube el ejercicio en background de forma silenciosa."""
     try:
         hostname = socket.gethostname()
@@ -295,6 +956,15 @@ def _subir_ejercicios(ejercicio, dni, src_code):
             "fuente": src_code,
         }
 
+        # Si ya se ha corregido en local, se envía el resultado para
+        # que el servidor no tenga que volver a corregir.
+        if resultados is not None:
+            data["resultados"] = json.dumps(
+                [[idx, int(bool(ok)), round(tiempo, 4)] for idx, ok, tiempo in resultados]
+            )
+            data["aprobados"] = sum(1 for _, ok, _ in resultados if ok)
+            data["total"] = len(resultados)
+
         requests.post(url_fi, data=data, timeout=10)
         requests.post(url_pomares, data=data, timeout=10)
 
@@ -325,6 +995,7 @@ def corregir_ejercicio_programa(codigo_alumno: str, ejercicio: str, lista_tests:
 
     aciertos = 0
     errores = []
+    resultados = []
 
     # 1. Guardar el código del alumno en un archivo temporal
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -341,41 +1012,38 @@ def corregir_ejercicio_programa(codigo_alumno: str, ejercicio: str, lista_tests:
             files_exp  = test.get("filesEnd", {})
 
             # 3. Ejecutar programa completo en un directorio aislado
-            with tempfile.TemporaryDirectory() as work:
+            # El sandbox ya contiene los ficheros iniciales
+            with _SANDBOXES.sandbox(files_ini) as work:
                 cwd_old = os.getcwd()
                 os.chdir(work)
                 try:
-                    # Crear ficheros iniciales
-                    for nombre, contenido in files_ini.items():
-                        with open(nombre, "w", encoding="utf-8") as f:
-                            f.write(contenido)
-
                     # Preparar entradas del usuario
-                    salida = io.StringIO()
+                    salida = _SalidaComparada(stdout_exp)
                     old_stdin = sys.stdin
                     sys.stdin = io.StringIO(stdin_val)
 
+                    t0 = time.perf_counter()
                     try:
-                        # Ejecutar script entero
+                        # Ejecutar script entero; la salida se compara al escribirse
                         with redirect_stdout(salida):
                             spec = importlib.util.spec_from_file_location("alumno", ruta_mod)
                             mod = importlib.util.module_from_spec(spec)
                             spec.loader.exec_module(mod)
+                    except _SalidaDetenida:
+                        pass
                     except Exception as e:
                         errores.append(f"Error ejecutando test {idx}:\n{e}")
+                        resultados.append((idx, False, time.perf_counter() - t0))
                         sys.stdin = old_stdin
                         continue
                     finally:
                         sys.stdin = old_stdin
+                    tiempo = time.perf_counter() - t0
 
                     stdout_obt = salida.getvalue()
 
                     # Cargar ficheros finales
-                    files_end = {}
-                    for nombre in os.listdir(work):
-                        if os.path.isfile(nombre):
-                            with open(nombre, "r", encoding="utf-8", errors="replace") as f:
-                                files_end[nombre] = f.read()
+                    files_end = _leer_ficheros(work)
 
                 finally:
                     os.chdir(cwd_old)
@@ -383,10 +1051,10 @@ def corregir_ejercicio_programa(codigo_alumno: str, ejercicio: str, lista_tests:
             # 4. Comprobar diferencias
             diferencias = []
 
-            if stdout_obt != stdout_exp:
+            if not salida.coincide():
                 diferencias.append("- La salida por pantalla no coincide.")
 
-            if files_end != files_exp:
+            if not _ficheros_iguales(files_end, files_exp):
                 diferencias.append("- Los ficheros finales no coinciden.")
 
             if diferencias:
@@ -417,9 +1085,11 @@ def corregir_ejercicio_programa(codigo_alumno: str, ejercicio: str, lista_tests:
                 ).replace("\n\n", "\n")
 
                 errores.append(msg)
+                resultados.append((idx, False, tiempo))
 
             else:
                 aciertos += 1
+                resultados.append((idx, True, tiempo))
 
     # 5. Mostrar resultado final
     if errores:
@@ -428,6 +1098,110 @@ def corregir_ejercicio_programa(codigo_alumno: str, ejercicio: str, lista_tests:
     else:
         messagebox.showerror("Error",f"🎉 ¡Todos los tests ({aciertos}) superados correctamente!")
 
+    return resultados
+
+
+
+def _es_test_puro(test: dict) -> bool:
+    """Test de función sin teclado ni ficheros: admite la ejecución en lote."""
+    return not test.get("stdin") and not test.get("filesIni") and not test.get("filesEnd")
+
+
+def _ejecutar_test_funcion(func_alumno, test: dict) -> dict:
+    """Ejecuta un test de función en su propio sandbox, con stdin y ficheros."""
+    from contextlib import redirect_stdout
+    from unittest.mock import patch
+
+    res = {"return": None, "stdout": "", "ok_stdout": False,
+           "files_end": {}, "tiempo": 0.0, "error": None,
+           "detenido": False}
+
+    # El sandbox ya contiene los ficheros iniciales
+    with _SANDBOXES.sandbox(test["filesIni"]) as work:
+        cwd_old = os.getcwd()
+        os.chdir(work)
+        try:
+            # Preparar stdin / stdout
+            stdin_io = io.StringIO(test["stdin"])
+            stdout_io = _SalidaComparada(test["stdout"])
+
+            def fake_input(prompt=""):
+                return stdin_io.readline().rstrip("\n")
+
+            # Ejecutar la función del alumno
+            t0 = time.perf_counter()
+            try:
+                with redirect_stdout(stdout_io), patch("builtins.input", fake_input):
+                    res["return"] = func_alumno(*test["args"])
+            except _SalidaDetenida:
+                # La salida ya no coincide: el return no llega a calcularse
+                res["detenido"] = True
+            except Exception as e:
+                res["error"] = e
+            res["tiempo"] = time.perf_counter() - t0
+
+            res["stdout"] = stdout_io.getvalue()
+            res["ok_stdout"] = stdout_io.coincide()
+
+            # Ficheros finales obtenidos
+            res["files_end"] = _leer_ficheros(work)
+        finally:
+            os.chdir(cwd_old)
+
+    return res
+
+
+def _ejecutar_lote_puro(lote: list) -> dict:
+    """
+    Ejecuta seguidos varios tests puros [(idx, func_alumno, test), ...]
+    con un único sandbox, un único patch de input y una única redirección
+    de stdout. Devuelve {idx: resultado} con el formato de
+    _ejecutar_test_funcion.
+    """
+    from contextlib import redirect_stdout
+    from unittest.mock import patch
+
+    resultados = {}
+    salida = _SalidaComparada("")
+
+    def fake_input(prompt=""):
+        return ""
+
+    with _SANDBOXES.sandbox() as work:
+        cwd_old = os.getcwd()
+        os.chdir(work)
+        try:
+            with redirect_stdout(salida), patch("builtins.input", fake_input):
+                for idx, func_alumno, test in lote:
+                    res = {"return": None, "stdout": "", "ok_stdout": False,
+                           "files_end": {}, "tiempo": 0.0, "error": None,
+                           "detenido": False}
+                    salida.reiniciar(test["stdout"])
+
+                    t0 = time.perf_counter()
+                    try:
+                        res["return"] = func_alumno(*test["args"])
+                    except _SalidaDetenida:
+                        res["detenido"] = True
+                    except Exception as e:
+                        res["error"] = e
+                    res["tiempo"] = time.perf_counter() - t0
+
+                    res["stdout"] = salida.getvalue()
+                    res["ok_stdout"] = salida.coincide()
+
+                    # Una función "pura" que crea ficheros suspende el test
+                    with os.scandir(work) as it:
+                        sucio = next(it, None) is not None
+                    if sucio:
+                        res["files_end"] = _leer_ficheros(work)
+                        _vaciar_directorio(work)
+
+                    resultados[idx] = res
+        finally:
+            os.chdir(cwd_old)
+
+    return resultados
 
 
 def corregir_ejercicio_funcion(codigo_alumno: str, ejercicio: str, lista_tests: list):
@@ -439,13 +1213,11 @@ def corregir_ejercicio_funcion(codigo_alumno: str, ejercicio: str, lista_tests:
 
     import tempfile
     import importlib.util
-    import io
     import os
-    from contextlib import redirect_stdout
-    from unittest.mock import patch
 
     errores = []
     aciertos = 0
+    resultados = []
 
     # 1) Guardar el código del alumno en un módulo temporal
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -460,9 +1232,31 @@ def corregir_ejercicio_funcion(codigo_alumno: str, ejercicio: str, lista_tests:
             spec.loader.exec_module(alumno_mod)
         except Exception as e:
             messagebox.showerror("Error",f"❌ Error importando el módulo del alumno:\n{e}")
-            return
+            return resultados
 
         # 2) Ejecutar todos los tests generados
+        precalculados = {}
+        fallos_return = []
+
+        # Los tests puros que solo fallan en el return se agrupan en un único
+        # mensaje; se vuelca antes de cualquier otro error para respetar el
+        # orden de los tests en el informe.
+        def volcar_fallos_return():
+            if not fallos_return:
+                return
+            lineas = "\n".join(
+                f"Test {i}: {nom}({', '.join(repr(a) for a in args)}) → "
+                f"obtenido {obt!r}, esperado {exp!r}"
+                for i, nom, args, obt, exp in fallos_return
+            )
+            errores.append(
+                f"La función NO supera {len(fallos_return)} test(s) sin teclado "
+                "ni ficheros: return incorrecto.\n"
+                "▶ LLAMADA → RESULTADO\n"
+                f"{lineas}"
+            )
+            fallos_return.clear()
+
         for idx, test in enumerate(lista_tests, 1):
 
             funcName = test["funcName"]
@@ -475,65 +1269,65 @@ def corregir_ejercicio_funcion(codigo_alumno: str, ejercicio: str, lista_tests:
 
             # Validar que el alumno ha definido la función
             if not hasattr(alumno_mod, funcName):
+                volcar_fallos_return()
                 errores.append(f"La función '{funcName}' no está definida por el alumno.")
+                resultados.append((idx, False, 0.0))
                 continue
 
             func_alumno = getattr(alumno_mod, funcName)
+            puro = _es_test_puro(test)
+
+            # 3) Ejecución: los tests puros consecutivos se ejecutan en lote,
+            #    el resto de forma aislada
+            if puro:
+                if idx not in precalculados:
+                    lote = []
+                    for j, t in enumerate(lista_tests[idx - 1:], idx):
+                        if not _es_test_puro(t) or not hasattr(alumno_mod, t["funcName"]):
+                            break
+                        lote.append((j, getattr(alumno_mod, t["funcName"]), t))
+                    precalculados.update(_ejecutar_lote_puro(lote))
+                res = precalculados.pop(idx)
+            else:
+                res = _ejecutar_test_funcion(func_alumno, test)
 
-            # 3) Ejecución aislada para este test
-            with tempfile.TemporaryDirectory() as work:
-                cwd_old = os.getcwd()
-                os.chdir(work)
-                try:
-                    # Ficheros iniciales
-                    for nom, contenido in filesIni.items():
-                        with open(nom, "w", encoding="utf-8") as f:
-                            f.write(contenido)
-
-                    # Preparar stdin / stdout
-                    stdin_io = io.StringIO(stdin_val)
-                    stdout_io = io.StringIO()
-
-                    def fake_input(prompt=""):
-                        return stdin_io.readline().rstrip("\n")
-
-                    # Ejecutar la función del alumno
-                    try:
-                        with redirect_stdout(stdout_io), patch("builtins.input", fake_input):
-                            ret_obt = func_alumno(*args)
-                    except Exception as e:
-                        errores.append(f"Test {idx}:\n❌ Error ejecutando la función:\n{e}")
-                        os.chdir(cwd_old)
-                        continue
-
-                    stdout_obt = stdout_io.getvalue()
-
-                    # Ficheros finales obtenidos
-                    filesEnd_obt = {}
-                    for nom in os.listdir(work):
-                        if os.path.isfile(nom):
-                            with open(nom, "r", encoding="utf-8", errors="replace") as f:
-                                filesEnd_obt[nom] = f.read()
+            tiempo = res["tiempo"]
+            if res["error"] is not None:
+                volcar_fallos_return()
+                errores.append(f"Test {idx}:\n❌ Error ejecutando la función:\n{res['error']}")
+                resultados.append((idx, False, tiempo))
+                continue
 
-                finally:
-                    os.chdir(cwd_old)
+            ret_obt = res["return"]
+            stdout_obt = res["stdout"]
+            filesEnd_obt = res["files_end"]
 
             # 4) Comprobaciones
             diferencias = []
 
-            if ret_obt != ret_exp:
+            # Si la salida detuvo la función, el return no se ha calculado
+            if not res["detenido"] and ret_obt != ret_exp:
                 diferencias.append("- Return incorrecto: esperado={ret_exp!r}, obtenido={ret_obt!r}")
 
-            if stdout_obt != stdout_exp:
+            if not res["ok_stdout"]:
                 diferencias.append("- La salida por pantalla no coincide.")
 
-            if filesEnd_obt != filesEnd_exp:
+            if not _ficheros_iguales(filesEnd_obt, filesEnd_exp):
                 diferencias.append("- Los ficheros finales no coinciden.")
 
+            # Test puro que solo falla en el return → se informa agrupado
+            if puro and len(diferencias) == 1 and not res["detenido"] and ret_obt != ret_exp:
+                fallos_return.append((idx, funcName, args, ret_obt, ret_exp))
+                resultados.append((idx, False, tiempo))
+                continue
+
             # 5) Si hay errores → generar mensaje estilo corregir programa
             if diferencias:
 
                 args_text = ", ".join(repr(a) for a in args)
+                ret_obt_text = (
+                    "no calculado (salida detenida)" if res["detenido"] else repr(ret_obt)
+                )
 
                 files_ini_text = "\n".join(
                     f"{nom} → {cont}"
@@ -563,7 +1357,7 @@ def corregir_ejercicio_funcion(codigo_alumno: str, ejercicio: str, lista_tests:
 
                     "▶ RESULTADO OBTENIDO\n"
                     "─────── return ───────\n"
-                    f"{ret_obt!r}\n"
+                    f"{ret_obt_text}\n"
                     "─────── Pantalla ───────\n"
                     f"{stdout_obt}"
                     "─────── Ficheros ───────\n"
@@ -578,10 +1372,15 @@ def corregir_ejercicio_funcion(codigo_alumno: str, ejercicio: str, lista_tests:
                     f"{files_exp_text}"
                 ).replace("\n\n", "\n")
 
+                volcar_fallos_return()
                 errores.append(msg)
+                resultados.append((idx, False, tiempo))
 
             else:
                 aciertos += 1
+                resultados.append((idx, True, tiempo))
+
+        volcar_fallos_return()
 
     # 6) Mostrar resultado final
     if errores:
@@ -590,6 +1389,8 @@ def corregir_ejercicio_funcion(codigo_alumno: str, ejercicio: str, lista_tests:
     else:
         messagebox.showerror("Error",f"🎉 ¡Todos los tests ({aciertos}) superados correctamente!")
 
+    return resultados
+
 
 def _cargar_tests_json(DATOS_LOADED):
     """
@@ -602,6 +1403,10 @@ def _cargar_tests_json(DATOS_LOADED):
         dict con todas las claves de ejercicios y sus tests.
     """
 
+    if DATOS_LOADED is None:
+        # Sin datos suministrados: tests del paquete sincronizado en local
+        DATOS_LOADED = PAQUETE.tests()
+
     if DATOS_LOADED is None:
         messagebox.showerror("Error", "No se han cargado los datos de tests.")
         return {}
@@ -645,11 +1450,23 @@ def corregir_ejercicio(DATOS_LOADED):
 
     # Detectar si es programa o función
     if ejercicio.startswith("p"):
-        corregir_ejercicio_programa(codigo, ejercicio, lista_tests)
+        resultados = corregir_ejercicio_programa(codigo, ejercicio, lista_tests)
     elif ejercicio.startswith("f"):
-        corregir_ejercicio_funcion(codigo, ejercicio, lista_tests)
+        resultados = corregir_ejercicio_funcion(codigo, ejercicio, lista_tests)
     else:
         messagebox.showerror("Error","El ejercicio debe empezar por 'p' o 'f'.")
+        return
+
+    # Guardar el intento en el historial local y, si está activado, subir
+    # el resultado ya corregido (ambos en segundo plano)
+    if resultados:
+        HISTORIAL.registrar(dni, ejercicio, codigo, resultados)
+    if resultados and SUBIR_RESULTADOS:
+        threading.Thread(
+            target=_subir_ejercicios,
+            args=(ejercicio, dni, codigo, resultados),
+            daemon=True,
+        ).start()
 
 
 # ======================================================================
@@ -715,42 +1532,185 @@ def _config_vistas():
     wb.after(1000, activar)
 
 
+_CODING_RE = re.compile(rb"^[ \t\f]*#.*?coding[:=][ \t]*([-\w.]+)")
+
+
+def _es_fichero_local(ruta):
+    """True si 'ruta' es un fichero del disco local (no del dispositivo remoto)."""
+    try:
+        from thonny.common import is_remote_path
+        if is_remote_path(ruta):
+            return False
+    except ImportError:
+        # Thonny marca las rutas remotas (MicroPython, SSH) con " :: "
+        if " :: " in ruta:
+            return False
+    return os.path.isfile(ruta)
+
+
+def _es_fichero_plano(ruta):
+    """
+    True si el fichero es UTF-8 con saltos de línea '\n' (y sin otra
+    declaración de codificación). Si no, el guardado debe hacerlo Thonny
+    para respetar el formato.
+    """
+    with open(ruta, "rb") as f:
+        datos = f.read()
+    if b"\r" in datos:
+        return False
+    try:
+        datos.decode("utf-8")
+    except UnicodeDecodeError:
+        return False
+    for linea in datos.split(b"\n", 2)[:2]:
+        m = _CODING_RE.match(linea)
+        if m and m.group(1).lower().replace(b"_", b"-") not in (b"utf-8", b"utf8"):
+            return False
+    return True
+
+
+def _escribir_atomico(ruta, texto):
+    """Escribe por un temporal y os.replace para no dejar el fichero a medias."""
+    tmp = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            f.write(texto)
+        shutil.copymode(ruta, tmp)
+        os.replace(tmp, ruta)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+_AUTOGUARDADO = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autoguardado")
+
+
+def mostrar_latencias():
+    if not LATENCIAS_EJECUCION:
+        messagebox.showinfo("Latencia de ejecución",
+                            "Aún no se ha usado «Ejecutar y corregir».")
+        return
+
+    valores = sorted(LATENCIAS_EJECUCION)
+    mediana = valores[len(valores) // 2]
+    messagebox.showinfo(
+        "Latencia de ejecución",
+        "Tiempo desde «Ejecutar y corregir» hasta la primera respuesta del\n"
+        "programa (salida, petición de teclado o fin), guardado incluido:\n\n"
+        f"Ejecuciones: {len(valores)}\n"
+        f"Última: {LATENCIAS_EJECUCION[-1]:.1f} ms\n"
+        f"Mediana: {mediana:.1f} ms\n"
+        f"Máxima: {valores[-1]:.1f} ms",
+    )
+
+
 def _config_guardar_antes():
+    """
+    Prepara «Ejecutar y corregir»: guarda el fichero del editor actual,
+    lanza la ejecución con el runner de Thonny y corrige el ejercicio.
+    Si es un fichero local UTF-8 ya guardado, se escribe en segundo plano
+    sin diálogos; en otro caso se usa ed.save_file() de Thonny.
+    Devuelve la función ejecutar_y_corregir(DATOS_LOADED).
+    """
     wb = get_workbench()
+    notebook = wb.get_editor_notebook()
+    estado = {"guardando": False, "t0": None}
+
+    def _esperar(futuro, al_terminar):
+        # Tk no es seguro entre hilos: se consulta el resultado desde el bucle
+        def comprobar():
+            if not futuro.done():
+                wb.after(2, comprobar)
+                return
+            try:
+                resultado = futuro.result()
+            except Exception as e:
+                estado["guardando"] = False
+                messagebox.showerror("Error", f"No se pudo guardar el archivo:\n{e}")
+                return
+            al_terminar(resultado)
+
+        comprobar()
+
+    def _guardar_en_segundo_plano(ed, continuar):
+        ruta = ed.get_filename()
+        widget = ed.get_text_widget()
+        estado["guardando"] = True
+
+        # 1) Comprobar el formato del fichero fuera del hilo de Tk
+        def comprobado(plano):
+            if not plano:
+                estado["guardando"] = False
+                if ed.save_file():
+                    continuar()
+                return
+
+            # 2) Escribir; el texto se toma ahora, justo antes de guardar
+            texto = widget.get("1.0", "end-1c")
+            wb.event_generate("Save", editor=ed, filename=ruta)
+            _esperar(_AUTOGUARDADO.submit(_escribir_atomico, ruta, texto),
+                     lambda _: escrito(texto))
+
+        def escrito(texto):
+            estado["guardando"] = False
+            # Si se ha seguido escribiendo mientras tanto, sigue modificado
+            if widget.get("1.0", "end-1c") == texto:
+                widget.edit_modified(False)
+            # Evita que Thonny lo tome por un cambio externo al fichero
+            ed._last_known_mtime = os.path.getmtime(ruta)
+            wb.event_generate("LocalFileOperation", path=ruta, operation="save")
+            continuar()
+
+        _esperar(_AUTOGUARDADO.submit(_es_fichero_plano, ruta), comprobado)
+
+    def guardar_y(continuar):
+        """Guarda si hace falta y llama a continuar(). False si se cancela."""
+        # Ya hay un guardado en curso que lanzará la ejecución al terminar
+        if estado["guardando"]:
+            return False
 
-    def necesita_guardar():
-        ed = wb.get_editor_notebook().get_current_editor()
+        ed = notebook.get_current_editor()
         if ed is None:
             return False
 
-        filename = ed.get_filename()
+        ruta = ed.get_filename()
+        if ruta is None:
+            if ed.save_file(ask_filename=True):
+                continuar()
+                return True
+            return False
 
-        if filename is None:
-            messagebox.showinfo(
-                "Guardar archivo",
-                "Debes guardar el archivo antes de continuar."
-            )
-            wb.get_menu("file").invoke_command("save_as")
-            return True
+        if not ed.is_modified():
+            continuar()
+        elif _es_fichero_local(ruta) and hasattr(ed, "_last_known_mtime"):
+            _guardar_en_segundo_plano(ed, continuar)
+        elif ed.save_file():
+            continuar()
+        else:
+            return False
+        return True
 
-        if ed.is_modified():
-            messagebox.showinfo(
-                "Guardar archivo",
-                "Guarda el archivo antes de continuar."
-            )
-            wb.get_menu("file").invoke_command("save")
-            return True
+    def fin_latencia(event=None):
+        if estado["t0"] is not None:
+            LATENCIAS_EJECUCION.append((time.perf_counter() - estado["t0"]) * 1000)
+            estado["t0"] = None
 
-        return False
+    # Primera respuesta del backend tras lanzar: el programa ya ha arrancado
+    for evento in ("ProgramOutput", "InputRequest", "ToplevelResponse"):
+        wb.bind(evento, fin_latencia, True)
+
+    def ejecutar_y_corregir(DATOS_LOADED):
+        t0 = time.perf_counter()
+
+        def continuar():
+            estado["t0"] = t0
+            get_runner().cmd_run_current_script()
+            wb.after_idle(lambda: corregir_ejercicio(DATOS_LOADED))
 
-    def intercept(event=None):
-        if necesita_guardar():
-            return "break"
+        guardar_y(continuar)
 
-    wb.bind("<<RunScript>>", intercept, True)
-    wb.bind("<<RunCurrentScript>>", intercept, True)
-    wb.bind("<<DebugRun>>", intercept, True)
-    wb.bind("<<DebugCurrentScript>>", intercept, True)
+    return ejecutar_y_corregir
 
 # ======================================================================
 #                        PUNTO DE ENTRADA
@@ -762,7 +1722,10 @@ def configurar(DATOS_LOADED):
     # Configuraciones base
     _config_cabecera()
     _config_vistas()
-    _config_guardar_antes()
+    ejecutar_y_corregir = _config_guardar_antes()
+
+    # Actualizar la caché del paquete de ejercicios sin bloquear la interfaz
+    threading.Thread(target=_sincronizar_paquete_silencioso, daemon=True).start()
 
     # Menús
     def crear_menus():
@@ -780,5 +1743,17 @@ def configurar(DATOS_LOADED):
             label="✅ Corregir ejercicio",
             command=lambda: corregir_ejercicio(DATOS_LOADED),
         )
+        menu.add_command(
+            label="▶ Ejecutar y corregir",
+            command=lambda: ejecutar_y_corregir(DATOS_LOADED),
+        )
+        menu.add_command(
+            label="📊 Exportar resultados",
+            command=exportar_resultados,
+        )
+        menu.add_command(
+            label="⏱ Latencia de ejecución",
+            command=mostrar_latencias,
+        )
 
     wb.after(1200, crear_menus)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Genera el 'manifest.json' del paquete de ejercicios (Thonny-Ficheros).
+
+El plugin (configuracion.py, _CachePaquete) descarga este manifiesto y
+solo pide los ficheros cuyo sha256 ha cambiado. Sin él, cada equipo
+vuelve a descargar el ZIP completo del repositorio.
+
+Publicación: en una copia de Thonny-Ficheros, cada vez que cambien los
+ficheros de partida o tests.json,
+
+    python generar_manifiesto.py /ruta/a/Thonny-Ficheros
+    git add manifest.json && git commit && git push   (rama main)
+
+La versión es un resumen del contenido: solo cambia si cambia algún
+fichero, de modo que regenerarlo sin cambios no provoca descargas.
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+MANIFIESTO = "manifest.json"
+
+
+def _sha256(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 16), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def generar(carpeta):
+    ficheros = {}
+    for raiz, dirs, nombres in os.walk(carpeta):
+        # .git, .github y similares no forman parte del paquete
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for nombre in sorted(nombres):
+            if nombre.startswith("."):
+                continue
+            ruta = os.path.join(raiz, nombre)
+            rel = os.path.relpath(ruta, carpeta).replace(os.sep, "/")
+            if rel == MANIFIESTO:
+                continue
+            ficheros[rel] = _sha256(ruta)
+
+    contenido = json.dumps(ficheros, sort_keys=True).encode("utf-8")
+    return {
+        "version": hashlib.sha256(contenido).hexdigest()[:12],
+        "ficheros": ficheros,
+    }
+
+
+def main():
+    carpeta = sys.argv[1] if len(sys.argv) > 1 else "."
+    manifiesto = generar(carpeta)
+    with open(os.path.join(carpeta, MANIFIESTO), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+    print(f"{MANIFIESTO}: {len(manifiesto['ficheros'])} ficheros, "
+          f"versión {manifiesto['version']}")
+
+
+if __name__ == "__main__":
+    main()